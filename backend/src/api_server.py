@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 import tempfile
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Annotated, List
 
+import anyio
+import anyio.to_thread
 from fastapi import FastAPI, File, Form, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse
@@ -15,11 +20,11 @@ from pydantic import BaseModel
 
 try:
     from .chat_engine import chat_with_documents
-    from .document_store import build_document_store
+    from .document_store import build_document_store, safe_filename, write_stream
     from .ingestion_engine import delete_document_vectors, index_document_file
 except ImportError:
     from chat_engine import chat_with_documents
-    from document_store import build_document_store
+    from document_store import build_document_store, safe_filename, write_stream
     from ingestion_engine import delete_document_vectors, index_document_file
 
 try:
@@ -31,7 +36,13 @@ except ImportError:
         extract_text = None
 
 
-app = FastAPI(title="Docspace API", version="0.2")
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    document_store.close()
+
+
+app = FastAPI(title="Docspace API", version="0.2", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -64,6 +75,21 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def upload_buffer_bytes() -> int:
+    default = 1024 * 1024
+    try:
+        value = int(os.getenv("UPLOAD_BUFFER_BYTES", str(default)))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+@lru_cache(maxsize=1)
+def extraction_limiter() -> anyio.CapacityLimiter:
+    # Kept below AnyIO's shared 40-thread limit so sync endpoints stay responsive.
+    return anyio.CapacityLimiter(32)
+
+
 class ChatRequest(BaseModel):
     message: str
 
@@ -91,27 +117,33 @@ async def ingest_files(files: List[UploadFile] = File(...)) -> JSONResponse:
     with tempfile.TemporaryDirectory(prefix="docspace_ingest_") as temp_dir:
         temp_path = Path(temp_dir)
         saved = 0
+        paths: list[Path] = []
         for item in files:
             if not item.filename:
                 continue
-            target = temp_path / Path(item.filename).name
-            data = await item.read()
-            if not data:
+            target = temp_path / safe_filename(item.filename)
+            if not await write_stream(item, target, upload_buffer_bytes()):
                 continue
-            target.write_bytes(data)
             saved += 1
+            if target not in paths:
+                paths.append(target)
 
         if saved == 0:
             raise HTTPException(status_code=400, detail="No valid files")
 
+        limiter = extraction_limiter()
+        results = await asyncio.gather(
+            *(anyio.to_thread.run_sync(extract_text, path, limiter=limiter) for path in paths),
+            return_exceptions=True,
+        )
+
         extracted = 0
         failures: list[str] = []
-        for path in temp_path.iterdir():
-            try:
-                if extract_text(path):
-                    extracted += 1
-            except Exception as exc:
-                failures.append(f"{path.name}: {exc}")
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                failures.append(f"{path.name}: {result}")
+            elif result:
+                extracted += 1
 
     return JSONResponse(
         {
@@ -158,11 +190,12 @@ async def create_document(
     if not filename:
         raise HTTPException(status_code=400, detail="Missing file name")
 
-    payload = await file.read()
-    if not payload:
+    saved_file = await document_store.storage.save_stream(
+        filename, file, file.content_type, upload_buffer_bytes()
+    )
+    if saved_file is None:
         raise HTTPException(status_code=400, detail="Uploaded file was empty")
 
-    saved_file = document_store.storage.save_upload(filename, payload, file.content_type)
     document = document_store.create_document(
         saved_file=saved_file,
         title=title,
@@ -170,8 +203,8 @@ async def create_document(
         owner=owner,
         description=description,
         pinned=pinned,
+        index_status="processing",
     )
-    document_store.set_index_status(document["id"], status="processing", error="")
     try:
         result = index_document_file(document, saved_file.path)
         document = document_store.set_index_status(
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import string
 import threading
 import uuid
 from dataclasses import dataclass
@@ -16,6 +18,13 @@ except ModuleNotFoundError:  # pragma: no cover
     psycopg = None
     dict_row = None
 
+# Optional: psycopg_pool>=3.2 (for ConnectionPool.check_connection) enables pooling;
+# without it each call opens its own psycopg connection.
+try:
+    from psycopg_pool import ConnectionPool
+except ModuleNotFoundError:  # pragma: no cover
+    ConnectionPool = None
+
 
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
@@ -42,11 +51,33 @@ def file_kind(filename: str) -> str:
     return "file"
 
 
+UNSAFE_FILENAME_CHARS = str.maketrans({"\\": "_", "\x00": "_"})
+LEADING_FILENAME_CHARS = "." + string.whitespace
+
+
 def safe_filename(filename: str) -> str:
-    cleaned = Path(filename).name.strip()
+    cleaned = Path(filename).name.translate(UNSAFE_FILENAME_CHARS).lstrip(LEADING_FILENAME_CHARS).rstrip()
     return cleaned or f"upload-{uuid.uuid4().hex}"
 
 
+async def write_stream(source, target: Path, buffer_size: int) -> int:
+    # Peek first so an empty upload never creates or truncates the target.
+    chunk = await source.read(buffer_size)
+    if not chunk:
+        return 0
+    written = 0
+    try:
+        with target.open("wb") as handle:
+            while chunk:
+                await asyncio.to_thread(handle.write, chunk)
+                written += len(chunk)
+                chunk = await source.read(buffer_size)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return written
+
+
 @dataclass
 class SavedFile:
     filename: str
@@ -61,16 +92,20 @@ class FileStorage:
         self.root = root
         self.root.mkdir(parents=True, exist_ok=True)
 
-    def save_upload(self, filename: str, payload: bytes, mime_type: str | None) -> SavedFile:
+    async def save_stream(
+        self, filename: str, source, mime_type: str | None, buffer_size: int
+    ) -> SavedFile | None:
         cleaned = safe_filename(filename)
         stored_name = f"{uuid.uuid4().hex}-{cleaned}"
         path = self.root / stored_name
-        path.write_bytes(payload)
+        size_bytes = await write_stream(source, path, buffer_size)
+        if not size_bytes:
+            return None
         return SavedFile(
             filename=cleaned,
             stored_name=stored_name,
             path=path,
-            size_bytes=len(payload),
+            size_bytes=size_bytes,
             mime_type=mime_type,
         )
 
@@ -92,6 +127,7 @@ class JsonDocumentStore:
         self.data_path = data_path
         self.storage = storage
         self.lock = threading.Lock()
+        self._cache: tuple[tuple[int, int], dict[str, Any]] | None = None
         self.data_path.parent.mkdir(parents=True, exist_ok=True)
         if not self.data_path.exists():
             self.data_path.write_text(
@@ -99,11 +135,29 @@ class JsonDocumentStore:
                 encoding="utf-8",
             )
 
-    def _load(self) -> dict[str, Any]:
+    def close(self) -> None:
+        pass
+
+    def _stat_key(self) -> tuple[int, int]:
+        stat = self.data_path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> dict[str, Any]:
         return json.loads(self.data_path.read_text(encoding="utf-8"))
 
+    def _load(self) -> dict[str, Any]:
+        # Read-only snapshot shared between readers; writers must use _read().
+        key = self._stat_key()
+        cached = self._cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        payload = self._read()
+        self._cache = (key, payload)
+        return payload
+
     def _write(self, payload: dict[str, Any]) -> None:
         self.data_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        self._cache = (self._stat_key(), payload)
 
     def _record_activity(self, payload: dict[str, Any], *, action: str, document_id: str, detail: str) -> None:
         payload["activity"].insert(
@@ -173,6 +227,7 @@ class JsonDocumentStore:
         owner: str,
         pinned: bool,
         description: str,
+        index_status: str = "pending",
     ) -> dict[str, Any]:
         now = isoformat(utc_now())
         document = {
@@ -187,7 +242,7 @@ class JsonDocumentStore:
             "mime_type": saved_file.mime_type or "application/octet-stream",
             "size_bytes": saved_file.size_bytes,
             "pinned": pinned,
-            "index_status": "pending",
+            "index_status": index_status,
             "indexed_at": None,
             "index_error": "",
             "chunk_count": 0,
@@ -195,7 +250,7 @@ class JsonDocumentStore:
             "updated_at": now,
         }
         with self.lock:
-            payload = self._load()
+            payload = self._read()
             payload["documents"].append(document)
             self._record_activity(
                 payload,
@@ -208,7 +263,7 @@ class JsonDocumentStore:
 
     def delete_document(self, document_id: str) -> bool:
         with self.lock:
-            payload = self._load()
+            payload = self._read()
             for index, item in enumerate(payload["documents"]):
                 if item["id"] != document_id:
                     continue
@@ -229,7 +284,7 @@ class JsonDocumentStore:
 
     def set_pinned(self, document_id: str, pinned: bool) -> dict[str, Any] | None:
         with self.lock:
-            payload = self._load()
+            payload = self._read()
             for item in payload["documents"]:
                 if item["id"] != document_id:
                     continue
@@ -247,7 +302,7 @@ class JsonDocumentStore:
 
     def add_comment(self, document_id: str, author: str, body: str) -> dict[str, Any] | None:
         with self.lock:
-            payload = self._load()
+            payload = self._read()
             document = next((item for item in payload["documents"] if item["id"] == document_id), None)
             if document is None:
                 return None
@@ -279,7 +334,7 @@ class JsonDocumentStore:
         indexed_at: str | None = None,
     ) -> dict[str, Any] | None:
         with self.lock:
-            payload = self._load()
+            payload = self._read()
             for item in payload["documents"]:
                 if item["id"] != document_id:
                     continue
@@ -329,11 +384,37 @@ class PostgresDocumentStore:
             raise RuntimeError("psycopg is required for Postgres storage.")
         self.dsn = dsn
         self.storage = storage
+        self.synchronous_commit = os.getenv("DATABASE_SYNCHRONOUS_COMMIT", "").strip()
+        self.pool = None
+        if ConnectionPool is not None:
+            self.pool = ConnectionPool(
+                dsn,
+                min_size=1,
+                max_size=int(os.getenv("DATABASE_POOL_SIZE", "10")),
+                kwargs={"row_factory": dict_row},
+                check=ConnectionPool.check_connection,
+                open=True,
+            )
         self._init_db()
 
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
     def _connect(self):
+        if self.pool is not None:
+            return self.pool.connection()
         return psycopg.connect(self.dsn, row_factory=dict_row)
 
+    def _apply_commit_mode(self, cur) -> None:
+        # SET LOCAL scope: only the current write transaction, and safe behind poolers.
+        if self.synchronous_commit:
+            cur.execute(
+                "SELECT set_config('synchronous_commit', %s, true)",
+                (self.synchronous_commit,),
+            )
+
     def _init_db(self) -> None:
         with self._connect() as conn:
             with conn.cursor() as cur:
@@ -394,6 +475,21 @@ class PostgresDocumentStore:
                     )
                     """
                 )
+                cur.execute(
+                    "CREATE INDEX IF NOT EXISTS documents_department_kind_idx "
+                    "ON documents (lower(department), kind)"
+                )
+                cur.execute(
+                    "CREATE INDEX IF NOT EXISTS documents_updated_at_idx ON documents (updated_at DESC)"
+                )
+                cur.execute(
+                    "CREATE INDEX IF NOT EXISTS document_comments_document_idx "
+                    "ON document_comments (document_id, created_at)"
+                )
+                cur.execute(
+                    "CREATE INDEX IF NOT EXISTS document_activity_created_at_idx "
+                    "ON document_activity (created_at DESC)"
+                )
             conn.commit()
 
     def _record_activity(self, cur, *, action: str, document_id: str, detail: str) -> None:
@@ -405,14 +501,18 @@ class PostgresDocumentStore:
             (uuid.uuid4().hex, action, document_id, detail, utc_now()),
         )
 
-    def _comments_map(self, conn) -> dict[str, list[dict[str, Any]]]:
+    def _comments_map(self, conn, document_ids: list[str]) -> dict[str, list[dict[str, Any]]]:
+        if not document_ids:
+            return {}
         with conn.cursor() as cur:
             cur.execute(
                 """
                 SELECT id, document_id, author, body, created_at
                 FROM document_comments
+                WHERE document_id = ANY(%s)
                 ORDER BY created_at ASC
-                """
+                """,
+                (document_ids,),
             )
             rows = cur.fetchall()
         mapping: dict[str, list[dict[str, Any]]] = {}
@@ -459,7 +559,7 @@ class PostgresDocumentStore:
             clauses.append("(title ILIKE %s OR department ILIKE %s)")
             params.extend([f"%{query}%", f"%{query}%"])
         if department:
-            clauses.append("department ILIKE %s")
+            clauses.append("lower(department) = lower(%s)")
             params.append(department)
         if kind:
             clauses.append("kind = %s")
@@ -470,7 +570,6 @@ class PostgresDocumentStore:
         where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
         limit_sql = f"LIMIT {int(limit)}" if limit is not None else ""
         with self._connect() as conn:
-            comments = self._comments_map(conn)
             with conn.cursor() as cur:
                 cur.execute(
                     f"""
@@ -483,18 +582,22 @@ class PostgresDocumentStore:
                     params,
                 )
                 rows = cur.fetchall()
+            comments = self._comments_map(conn, [row["id"] for row in rows])
         return [self._document_payload(row, comments) for row in rows]
 
-    def get_document(self, document_id: str) -> dict[str, Any] | None:
-        with self._connect() as conn:
-            comments = self._comments_map(conn)
-            with conn.cursor() as cur:
-                cur.execute("SELECT * FROM documents WHERE id = %s", (document_id,))
-                row = cur.fetchone()
+    def _fetch_document(self, conn, document_id: str) -> dict[str, Any] | None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM documents WHERE id = %s", (document_id,))
+            row = cur.fetchone()
         if row is None:
             return None
+        comments = self._comments_map(conn, [document_id])
         return self._document_payload(row, comments)
 
+    def get_document(self, document_id: str) -> dict[str, Any] | None:
+        with self._connect() as conn:
+            return self._fetch_document(conn, document_id)
+
     def create_document(
         self,
         *,
@@ -504,11 +607,13 @@ class PostgresDocumentStore:
         owner: str,
         pinned: bool,
         description: str,
+        index_status: str = "pending",
     ) -> dict[str, Any]:
         document_id = uuid.uuid4().hex
         now = utc_now()
         with self._connect() as conn:
             with conn.cursor() as cur:
+                self._apply_commit_mode(cur)
                 cur.execute(
                     """
                     INSERT INTO documents (
@@ -530,7 +635,7 @@ class PostgresDocumentStore:
                         saved_file.mime_type or "application/octet-stream",
                         saved_file.size_bytes,
                         pinned,
-                        "pending",
+                        index_status,
                         None,
                         "",
                         0,
@@ -546,15 +651,19 @@ class PostgresDocumentStore:
                     (uuid.uuid4().hex, "UPLOAD", document_id, f"Uploaded {title or saved_file.filename}", now),
                 )
             conn.commit()
-        return self.get_document(document_id)  # type: ignore[return-value]
+            return self._fetch_document(conn, document_id)  # type: ignore[return-value]
 
     def delete_document(self, document_id: str) -> bool:
-        document = self.get_document(document_id)
-        if document is None:
-            return False
         with self._connect() as conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM documents WHERE id = %s", (document_id,))
+                self._apply_commit_mode(cur)
+                cur.execute(
+                    "DELETE FROM documents WHERE id = %s RETURNING title, stored_name",
+                    (document_id,),
+                )
+                document = cur.fetchone()
+                if document is None:
+                    return False
                 self._record_activity(
                     cur,
                     action="DELETE",
@@ -568,8 +677,9 @@ class PostgresDocumentStore:
     def set_pinned(self, document_id: str, pinned: bool) -> dict[str, Any] | None:
         with self._connect() as conn:
             with conn.cursor() as cur:
+                self._apply_commit_mode(cur)
                 cur.execute(
-                    "UPDATE documents SET pinned = %s, updated_at = %s WHERE id = %s RETURNING *",
+                    "UPDATE documents SET pinned = %s, updated_at = %s WHERE id = %s RETURNING title",
                     (pinned, utc_now(), document_id),
                 )
                 row = cur.fetchone()
@@ -582,11 +692,9 @@ class PostgresDocumentStore:
                     detail=f"{'Pinned' if pinned else 'Unpinned'} {row['title']}",
                 )
             conn.commit()
-        return self.get_document(document_id)
+            return self._fetch_document(conn, document_id)
 
     def add_comment(self, document_id: str, author: str, body: str) -> dict[str, Any] | None:
-        if self.get_document(document_id) is None:
-            return None
         comment = {
             "id": uuid.uuid4().hex,
             "document_id": document_id,
@@ -596,6 +704,10 @@ class PostgresDocumentStore:
         }
         with self._connect() as conn:
             with conn.cursor() as cur:
+                self._apply_commit_mode(cur)
+                cur.execute("SELECT 1 FROM documents WHERE id = %s", (document_id,))
+                if cur.fetchone() is None:
+                    return None
                 cur.execute(
                     """
                     INSERT INTO document_comments (id, document_id, author, body, created_at)
@@ -637,6 +749,7 @@ class PostgresDocumentStore:
             indexed_value = datetime.fromisoformat(indexed_at)
         with self._connect() as conn:
             with conn.cursor() as cur:
+                self._apply_commit_mode(cur)
                 cur.execute(
                     """
                     UPDATE documents
@@ -646,7 +759,7 @@ class PostgresDocumentStore:
                         indexed_at = COALESCE(%s, indexed_at),
                         updated_at = %s
                     WHERE id = %s
-                    RETURNING *
+                    RETURNING title
                     """,
                     (status, error, chunk_count, indexed_value, utc_now(), document_id),
                 )
@@ -660,7 +773,7 @@ class PostgresDocumentStore:
                     detail=f"Index status changed to {status} for {row['title']}",
                 )
             conn.commit()
-        return self.get_document(document_id)
+            return self._fetch_document(conn, document_id)
 
     def dashboard_stats(self) -> dict[str, Any]:
         with self._connect() as conn:
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import base64
 import json
 import os
 import re
+import sys
 import zipfile
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from html.parser import HTMLParser
+from itertools import islice
 from pathlib import Path
 from typing import Any
 from urllib import error, request
@@ -13,6 +21,10 @@ from urllib import error, request
 OPENAI_API_URL = "https://api.openai.com/v1"
 PINECONE_CONTROL_URL = "https://api.pinecone.io"
 PINECONE_API_VERSION = os.getenv("PINECONE_API_VERSION", "2025-10")
+PINECONE_MAX_UPSERT_BYTES = 2 * 1024 * 1024 - 64 * 1024
+PINECONE_MAX_UPSERT_VECTORS = 1000
+WORD_BREAK = re.compile(r"\s")
+LAST_WORD_BREAK = re.compile(r".*\s", re.DOTALL)
 
 
 class TextExtractor(HTMLParser):
@@ -30,9 +42,13 @@ class TextExtractor(HTMLParser):
 
 
 def _post_json(url: str, payload: dict[str, Any], headers: dict[str, str]) -> dict[str, Any]:
+    return _post_body(url, json.dumps(payload).encode("utf-8"), headers)
+
+
+def _post_body(url: str, body: bytes, headers: dict[str, str]) -> dict[str, Any]:
     req = request.Request(
         url,
-        data=json.dumps(payload).encode("utf-8"),
+        data=body,
         headers={"Content-Type": "application/json", **headers},
         method="POST",
     )
@@ -130,23 +146,35 @@ def extract_text(path: Path) -> str:
     return normalize_text(path.read_text(encoding="utf-8", errors="ignore"))
 
 
-def chunk_text(text: str, chunk_size: int, overlap: int) -> list[str]:
+def chunk_text(text: str, chunk_size: int, overlap: int) -> Iterator[str]:
     if chunk_size <= 0:
         raise ValueError("chunk_size must be positive")
     if overlap >= chunk_size:
         raise ValueError("overlap must be smaller than chunk_size")
 
-    chunks: list[str] = []
     start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
+    length = len(text)
+    while start < length:
+        end = min(length, start + chunk_size)
+        if end < length and not text[end].isspace():
+            boundary = LAST_WORD_BREAK.match(text, start + overlap + 1, end)
+            if boundary:
+                end = boundary.end() - 1
         chunk = text[start:end].strip()
         if chunk:
-            chunks.append(chunk)
-        if end >= len(text):
+            yield chunk
+        if end >= length:
             break
         start = end - overlap
-    return chunks
+        if not text[start - 1].isspace():
+            match = WORD_BREAK.search(text, start, end)
+            start = match.end() if match else end
+
+
+def batched(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 def openai_headers() -> dict[str, str]:
@@ -156,14 +184,44 @@ def openai_headers() -> dict[str, str]:
     return {"Authorization": f"Bearer {api_key}"}
 
 
-def create_embeddings(texts: list[str]) -> list[list[float]]:
+def decode_embedding(value: str) -> array:
+    vector = array("f")
+    vector.frombytes(base64.b64decode(value))
+    if sys.byteorder == "big":
+        vector.byteswap()
+    return vector
+
+
+@lru_cache(maxsize=1)
+def embedding_decimals() -> int | None:
+    # None sends full float32 precision: "", "none", or anything too coarse to keep
+    # unit-norm components distinguishable (including the legacy "0").
+    default = 7
+    value = os.getenv("EMBEDDING_DECIMALS", str(default)).strip().lower()
+    if value in {"", "none"}:
+        return None
+    try:
+        places = int(value)
+    except ValueError:
+        return default
+    return places if places >= 4 else None
+
+
+def vector_values(embedding: array) -> list[float]:
+    places = embedding_decimals()
+    if places is None:
+        return embedding.tolist()
+    return [round(value, places) for value in embedding]
+
+
+def create_embeddings(texts: list[str]) -> list[array]:
     model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small").strip()
     payload = _post_json(
         f"{OPENAI_API_URL}/embeddings",
-        {"model": model, "input": texts},
+        {"model": model, "input": texts, "encoding_format": "base64"},
         openai_headers(),
     )
-    return [item["embedding"] for item in payload["data"]]
+    return [decode_embedding(item["embedding"]) for item in payload["data"]]
 
 
 def chat_completion(messages: list[dict[str, str]]) -> str:
@@ -200,7 +258,11 @@ def pinecone_host() -> str:
     index_name = os.getenv("PINECONE_INDEX", "").strip()
     if not index_name:
         raise RuntimeError("Missing PINECONE_INDEX or PINECONE_HOST in .env.")
+    return describe_index_host(index_name)
 
+
+@lru_cache(maxsize=8)
+def describe_index_host(index_name: str) -> str:
     payload = _get_json(f"{PINECONE_CONTROL_URL}/indexes/{index_name}", pinecone_headers())
     host = payload.get("host", "").strip()
     if not host:
@@ -212,30 +274,48 @@ def pinecone_namespace() -> str:
     return os.getenv("PINECONE_NAMESPACE", "").strip()
 
 
-def upsert_chunks(document: dict[str, Any], chunks: list[str]) -> int:
+def split_upsert(vectors: list[dict[str, Any]]) -> Iterator[list[str]]:
+    # Yields JSON-encoded vectors so each one is serialised exactly once.
+    batch: list[str] = []
+    size = 0
+    for vector in vectors:
+        encoded = json.dumps(vector)
+        vector_size = len(encoded) + 1
+        if batch and (
+            size + vector_size > PINECONE_MAX_UPSERT_BYTES
+            or len(batch) >= PINECONE_MAX_UPSERT_VECTORS
+        ):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(encoded)
+        size += vector_size
+    if batch:
+        yield batch
+
+
+def upsert_chunks(document: dict[str, Any], chunks: list[str], start: int = 0) -> int:
     host = pinecone_host()
     embeddings = create_embeddings(chunks)
+    base_metadata = {
+        "document_id": document["id"],
+        "title": document["title"],
+        "department": document["department"],
+        "owner": document["owner"],
+    }
     vectors = []
-    for index, (chunk, embedding) in enumerate(zip(chunks, embeddings, strict=False)):
+    for index, (chunk, embedding) in enumerate(zip(chunks, embeddings, strict=False), start):
         vectors.append(
             {
                 "id": f"{document['id']}:{index}",
-                "values": embedding,
-                "metadata": {
-                    "document_id": document["id"],
-                    "title": document["title"],
-                    "department": document["department"],
-                    "owner": document["owner"],
-                    "chunk_index": index,
-                    "text": chunk,
-                },
+                "values": vector_values(embedding),
+                "metadata": {**base_metadata, "chunk_index": index, "text": chunk},
             }
         )
-    _post_json(
-        f"https://{host}/vectors/upsert",
-        {"vectors": vectors, "namespace": pinecone_namespace()},
-        pinecone_headers(),
-    )
+    namespace = json.dumps(pinecone_namespace())
+    for part in split_upsert(vectors):
+        body = f'{{"vectors": [{", ".join(part)}], "namespace": {namespace}}}'
+        _post_body(f"https://{host}/vectors/upsert", body.encode("utf-8"), pinecone_headers())
     return len(vectors)
 
 
@@ -257,7 +337,7 @@ def query_chunks(message: str, top_k: int = 6) -> list[dict[str, Any]]:
     payload = _post_json(
         f"https://{host}/query",
         {
-            "vector": embedding,
+            "vector": embedding.tolist(),
             "topK": top_k,
             "includeMetadata": True,
             "namespace": pinecone_namespace(),
@@ -345,6 +425,25 @@ def index_document_file(document: dict[str, Any], file_path: Path) -> dict[str,
         raise RuntimeError("No indexable text could be extracted from the file.")
     chunk_size = int(os.getenv("INGEST_CHUNK_SIZE", "1200"))
     overlap = int(os.getenv("INGEST_OVERLAP", "200"))
-    chunks = chunk_text(text, chunk_size, overlap)
-    count = upsert_chunks(document, chunks)
-    return {"chunk_count": count}
+    batch_size = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+    workers = max(1, int(os.getenv("INGEST_WORKERS", "4")))
+    offset = 0
+    indexed = 0
+    pending: deque[Future[int]] = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in batched(chunk_text(text, chunk_size, overlap), batch_size):
+                if len(pending) >= workers:
+                    indexed += pending.popleft().result()
+                pending.append(executor.submit(upsert_chunks, document, batch, offset))
+                offset += len(batch)
+            for future in pending:
+                indexed += future.result()
+    except Exception:
+        # Batches that already landed would otherwise keep serving a failed document.
+        try:
+            delete_document_vectors(document["id"])
+        except Exception:
+            pass
+        raise
+    return {"chunk_count": indexed}
@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import ingestion_engine  # noqa: E402
+
+
+def test_index_document_file_deletes_vectors_when_a_batch_fails(tmp_path, monkeypatch):
+    source = tmp_path / "notes.txt"
+    source.write_text(" ".join(f"word{i}" for i in range(200)), encoding="utf-8")
+    monkeypatch.setenv("INGEST_CHUNK_SIZE", "100")
+    monkeypatch.setenv("INGEST_OVERLAP", "0")
+    monkeypatch.setenv("INGEST_BATCH_SIZE", "2")
+    monkeypatch.setenv("INGEST_WORKERS", "1")
+
+    def fake_upsert(document, chunks, start=0):
+        if start >= 4:
+            raise RuntimeError("upsert failed")
+        return len(chunks)
+
+    deleted: list[str] = []
+    monkeypatch.setattr(ingestion_engine, "upsert_chunks", fake_upsert)
+    monkeypatch.setattr(ingestion_engine, "delete_document_vectors", deleted.append)
+
+    with pytest.raises(RuntimeError, match="upsert failed"):
+        ingestion_engine.index_document_file({"id": "doc-1"}, source)
+
+    assert deleted == ["doc-1"]
+
+
+WORDS = [f"w{index}" + "x" * (index % 7) for index in range(300)]
+TEXT = " ".join(WORDS)
+
+
+def test_chunk_text_does_not_split_words_that_fit():
+    chunks = list(ingestion_engine.chunk_text(TEXT, 50, 10))
+
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert {word for chunk in chunks for word in chunk.split()} == set(WORDS)
+
+
+def test_chunk_text_hard_cuts_words_longer_than_chunk_size():
+    chunks = list(ingestion_engine.chunk_text("x" * 100, 30, 5))
+
+    assert chunks[0] == "x" * 30
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert chunks[-1].endswith("x")
+
+
+def test_chunk_text_without_overlap():
+    assert list(ingestion_engine.chunk_text("aaa bbb ccc ddd", 8, 0)) == ["aaa bbb", "ccc ddd"]
+
+
+def test_chunk_text_breaks_on_any_whitespace():
+    text = "aaa\fbbb\u00a0ccc\vddd"
+
+    chunks = list(ingestion_engine.chunk_text(text, 10, 2))
+
+    assert chunks == ["aaa\fbbb", "ccc\vddd"]
+
+
+@pytest.mark.parametrize(
+    ("chunk_size", "overlap"),
+    [(1200, 200), (50, 10), (20, 0), (13, 12), (2, 1), (1, 0)],
+)
+def test_chunk_text_always_makes_progress(chunk_size, overlap):
+    chunks = list(ingestion_engine.chunk_text(TEXT, chunk_size, overlap))
+
+    assert chunks
+    assert len(chunks) <= len(TEXT)
+    assert all(len(chunk) <= chunk_size for chunk in chunks)